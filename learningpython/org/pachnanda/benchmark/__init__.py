@@ -0,0 +1,2 @@
+# learningpython/org/pachnanda/benchmark/__init__.py
+"""This package contains microbenchmarks for the Learning Python project."""
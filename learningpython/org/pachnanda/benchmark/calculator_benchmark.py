@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# learningpython/org/pachnanda/benchmark/calculator_benchmark.py
+
+"""Microbenchmarks for the Calculator class.
+
+This module measures the per-call cost of the Calculator methods with logging
+enabled and disabled, the divide by zero error path, object allocation, and
+the memory allocated per call. Results are saved as JSON together with
+machine metadata and can be compared against a committed baseline; regressions
+only fail the run when the baseline was recorded on a matching machine.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+from org.pachnanda.learning.calculator import Calculator
+
+DEFAULT_ROUNDS = 5
+DEFAULT_THRESHOLD = 20.0
+
+# Metadata that must match for timings to be comparable with a baseline
+COMPARABLE_METADATA = (
+    "python_version",
+    "python_implementation",
+    "machine",
+    "processor",
+    "cpu_count",
+)
+
+
+def _divide_by_zero(calc):
+    """Call divide with a zero denominator and swallow the error.
+
+    Args:
+        calc: The Calculator instance to use
+    """
+    try:
+        calc.divide(1, 0)
+    except ValueError:
+        pass
+
+
+def _cases(calc):
+    """Build the benchmark cases for a Calculator instance.
+
+    Args:
+        calc: The Calculator instance to benchmark
+
+    Returns:
+        dict: Mapping of case name to a zero-argument callable
+    """
+    return {
+        "add": lambda: calc.add(3, 4),
+        "subtract": lambda: calc.subtract(3, 4),
+        "multiply": lambda: calc.multiply(3, 4),
+        "divide": lambda: calc.divide(3, 4),
+        "divide_by_zero": lambda: _divide_by_zero(calc),
+        "construct": Calculator,
+    }
+
+
+def _time_case(func, rounds, number):
+    """Time a callable over several rounds.
+
+    Args:
+        func: Zero-argument callable to time
+        rounds: Number of timing rounds
+        number: Calls per round, or 0 to pick one automatically
+
+    Returns:
+        dict: Timing statistics in nanoseconds per call
+    """
+    timer = timeit.Timer(func)
+    if not number:
+        number, _ = timer.autorange()
+    times = [t / number * 1e9 for t in timer.repeat(repeat=rounds, number=number)]
+    return {
+        "ns_per_call": min(times),
+        "median_ns": statistics.median(times),
+        "stdev_ns": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def _alloc_per_call(func, calls=100):
+    """Measure the peak memory allocated by a single call of a callable.
+
+    Objects created by a call are normally freed before the next one, so the
+    peak traced memory over several calls is the allocation of one call.
+
+    Args:
+        func: Zero-argument callable to measure
+        calls: Number of calls to take the peak over
+
+    Returns:
+        int: Peak bytes allocated while the callable ran
+    """
+    func()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def run_benchmarks(rounds=DEFAULT_ROUNDS, number=0):
+    """Run every Calculator benchmark.
+
+    Each method is timed with logging enabled, writing to os.devnull through a
+    formatted handler, and with logging disabled, so the difference between
+    the two is the logging overhead.
+
+    Args:
+        rounds: Number of timing rounds per benchmark
+        number: Calls per round, or 0 to pick one automatically
+
+    Returns:
+        dict: Mapping of benchmark name to its statistics
+    """
+    root = logging.getLogger()
+    saved_handlers = root.handlers[:]
+    saved_level = root.level
+    devnull = open(os.devnull, "w")
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+    results = {}
+    calc = Calculator()
+    try:
+        for name, func in _cases(calc).items():
+            results[name] = _time_case(func, rounds, number)
+            results[name]["alloc_bytes_per_call"] = _alloc_per_call(func)
+
+        logging.disable(logging.CRITICAL)
+        for name, func in _cases(calc).items():
+            if name == "construct":
+                continue
+            key = f"{name}_nolog"
+            results[key] = _time_case(func, rounds, number)
+            results[key]["alloc_bytes_per_call"] = _alloc_per_call(func)
+    finally:
+        logging.disable(logging.NOTSET)
+        root.handlers = saved_handlers
+        root.setLevel(saved_level)
+        devnull.close()
+    return results
+
+
+def machine_metadata():
+    """Collect metadata describing the machine the benchmarks ran on.
+
+    Returns:
+        dict: Python, platform and CPU information plus a UTC timestamp
+    """
+    return {
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def metadata_differences(current, baseline):
+    """List the machine metadata that differs from a baseline.
+
+    Args:
+        current: Metadata of this run
+        baseline: Metadata of the baseline
+
+    Returns:
+        list: One (key, baseline value, current value) tuple per difference
+    """
+    return [
+        (key, baseline.get(key), current.get(key))
+        for key in COMPARABLE_METADATA
+        if baseline.get(key) != current.get(key)
+    ]
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare benchmark results against a baseline.
+
+    Args:
+        current: Benchmark statistics from this run
+        baseline: Benchmark statistics from the baseline
+        threshold: Allowed slowdown in percent before a benchmark regresses
+
+    Returns:
+        list: One (name, baseline ns, current ns, change in percent, regressed)
+              tuple per benchmark present in both runs
+    """
+    rows = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["ns_per_call"]
+        new = stats["ns_per_call"]
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    """Run the benchmarks, save the results and compare them to a baseline.
+
+    Args:
+        argv: Command line arguments, defaults to sys.argv
+
+    Returns:
+        int: 1 if any benchmark regressed beyond the threshold, otherwise 0.
+             Regressions are only reported, not failed, when the baseline is
+             missing or was recorded on a different machine.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Path to write the results JSON to")
+    parser.add_argument("--baseline", help="Path of a baseline JSON to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown in percent (default: %(default)s)",
+    )
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument(
+        "--number", type=int, default=0, help="Calls per round (default: auto)"
+    )
+    args = parser.parse_args(argv)
+
+    report = {
+        "metadata": machine_metadata(),
+        "benchmarks": run_benchmarks(args.rounds, args.number),
+    }
+    for name, stats in report["benchmarks"].items():
+        print(
+            f"{name:<22} {stats['ns_per_call']:>10.1f} ns/call "
+            f"{stats['alloc_bytes_per_call']:>8} B/call"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nResults written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, record one with --output first.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    differences = metadata_differences(report["metadata"], baseline.get("metadata", {}))
+    if differences:
+        print(f"\nWARNING: {args.baseline} was recorded on a different machine:")
+        for key, old, new in differences:
+            print(f"  {key}: {old!r} -> {new!r}")
+        print("Timings are shown for reference only; record a new baseline here.")
+
+    print(f"\nComparison with {args.baseline} (threshold {args.threshold}%):")
+    regressed = False
+    for name, old, new, change, failed in compare_results(
+        report["benchmarks"], baseline["benchmarks"], args.threshold
+    ):
+        status = "REGRESSION" if failed else "ok"
+        print(f"{name:<22} {old:>10.1f} -> {new:>10.1f} ns ({change:+.1f}%) {status}")
+        regressed = regressed or failed
+    return 1 if regressed and not differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# learningpython/org/pachnanda/test/test_calculator_benchmark.py
+
+"""
+Unit tests for the Calculator benchmark suite.
+
+This module contains test cases for running the benchmarks, saving their
+results and comparing them against a baseline.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from org.pachnanda.benchmark.calculator_benchmark import (
+    compare_results,
+    main,
+    metadata_differences,
+    run_benchmarks,
+)
+
+
+class TestCalculatorBenchmark(unittest.TestCase):
+    """Test cases for the Calculator benchmark suite."""
+
+    def test_run_benchmarks(self):
+        """Test that every case is benchmarked with and without logging."""
+        handlers = logging.getLogger().handlers[:]
+        results = run_benchmarks(rounds=2, number=10)
+        self.assertIn("divide_by_zero", results)
+        self.assertIn("divide_by_zero_nolog", results)
+        self.assertIn("construct", results)
+        self.assertEqual(results["add"]["number"], 10)
+        self.assertGreater(results["add"]["ns_per_call"], 0)
+        self.assertEqual(logging.getLogger().handlers, handlers)
+
+    def test_compare_results(self):
+        """Test that only slowdowns beyond the threshold are regressions."""
+        baseline = {"add": {"ns_per_call": 100.0}, "gone": {"ns_per_call": 1.0}}
+        current = {"add": {"ns_per_call": 125.0}, "new": {"ns_per_call": 1.0}}
+        self.assertEqual(
+            compare_results(current, baseline, 20), [("add", 100.0, 125.0, 25.0, True)]
+        )
+        self.assertFalse(compare_results(current, baseline, 30)[0][4])
+
+    def test_metadata_differences(self):
+        """Test that only metadata affecting timings is compared."""
+        baseline = {"python_version": "3.9.1", "cpu_count": 8, "timestamp": "a"}
+        current = {"python_version": "3.9.1", "cpu_count": 2, "timestamp": "b"}
+        self.assertEqual(metadata_differences(current, baseline), [("cpu_count", 8, 2)])
+        self.assertEqual(metadata_differences(current, current), [])
+
+    def test_main(self):
+        """Test that results are saved and compared against a baseline."""
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            args = ["--rounds", "2", "--number", "10", "--output", output]
+            self.assertEqual(main(args), 0)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertIn("python_version", report["metadata"])
+            self.assertIn("multiply", report["benchmarks"])
+
+            for stats in report["benchmarks"].values():
+                stats["ns_per_call"] = 1e-3
+            with open(output, "w") as f:
+                json.dump(report, f)
+            self.assertEqual(main(args[:4] + ["--baseline", output]), 1)
+
+            report["metadata"]["cpu_count"] = -1
+            with open(output, "w") as f:
+                json.dump(report, f)
+            self.assertEqual(main(args[:4] + ["--baseline", output]), 0)
+
+            missing = os.path.join(tmp, "missing.json")
+            self.assertEqual(main(args[:4] + ["--baseline", missing]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
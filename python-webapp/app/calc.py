@@ -0,0 +1,347 @@
+"""Batch calculation module for the Python Web App.
+
+This module evaluates batches of arithmetic operations using the Calculator
+class from the learningpython project. Request bodies are parsed incrementally
+as they are streamed in, and large batches are evaluated in a process pool so
+the event loop is never blocked by CPU-heavy work.
+"""
+
+import asyncio
+import codecs
+import json
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from org.pachnanda.learning import calculator
+from org.pachnanda.learning.calculator import Calculator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batches with at most this many items are evaluated on the event loop
+CALC_OFFLOAD_THRESHOLD = int(os.getenv("CALC_OFFLOAD_THRESHOLD", "256"))
+# Number of items sent to a worker process at a time
+CALC_CHUNK_SIZE = int(os.getenv("CALC_CHUNK_SIZE", "1024"))
+# Maximum number of items accepted in a single batch
+CALC_MAX_ITEMS = int(os.getenv("CALC_MAX_ITEMS", "100000"))
+# Maximum size of a single undecoded item held in the parse buffer
+CALC_MAX_ITEM_BYTES = int(os.getenv("CALC_MAX_ITEM_BYTES", "65536"))
+# Number of worker processes, defaults to the number of CPUs
+CALC_MAX_WORKERS = int(os.getenv("CALC_MAX_WORKERS", "0")) or None
+
+OPERATIONS = ("add", "subtract", "multiply", "divide")
+
+# JSON whitespace, which may appear around items and separators
+_WHITESPACE = " \t\r\n"
+
+_executor = None
+
+
+class _CalculatorLogFilter(logging.Filter):
+    """Drop the records the Calculator logs for every operation."""
+
+    def filter(self, record):
+        """Check whether a record was logged by the calculator module.
+
+        Args:
+            record: The log record to check
+
+        Returns:
+            bool: False for records logged by the calculator module
+        """
+        return record.pathname != calculator.__file__
+
+
+_calculator_log_filter = _CalculatorLogFilter()
+
+
+class BatchParseError(ValueError):
+    """Raised when a batch request body cannot be parsed."""
+
+
+class BatchTooLargeError(BatchParseError):
+    """Raised when a batch contains more items than CALC_MAX_ITEMS."""
+
+
+def get_executor():
+    """Return the process pool used to evaluate large batches.
+
+    The pool is created on first use so that applications which never receive
+    a large batch do not pay for starting worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The shared worker pool
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=CALC_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("Started calculator worker pool.")
+    return _executor
+
+
+def shutdown_executor():
+    """Shut down the calculator worker pool if it has been started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+        logger.info("Calculator worker pool shut down.")
+
+
+def _is_number(value):
+    """Check whether a decoded JSON value is a number.
+
+    Args:
+        value: The value to check
+
+    Returns:
+        bool: True if the value is an int or float but not a bool
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def evaluate_item(calc, item):
+    """Evaluate a single batch item with a Calculator.
+
+    Args:
+        calc: The Calculator instance to use
+        item: A decoded item of the form {"op": ..., "a": ..., "b": ...}
+
+    Returns:
+        dict: {"result": value} on success or {"error": message} on failure
+    """
+    if not isinstance(item, dict):
+        return {"error": "Item must be an object"}
+    op = item.get("op")
+    if op not in OPERATIONS:
+        return {"error": f"Unsupported operation: {op}"}
+    a = item.get("a")
+    b = item.get("b")
+    if not _is_number(a) or not _is_number(b):
+        return {"error": "Operands a and b must be numbers"}
+    try:
+        result = getattr(calc, op)(a, b)
+    except (ValueError, ArithmeticError) as e:
+        return {"error": str(e)}
+    if isinstance(result, float) and not math.isfinite(result):
+        return {"error": "Result is not a finite number"}
+    return {"result": result}
+
+
+def evaluate_chunk(items):
+    """Evaluate a list of batch items in order.
+
+    This function is submitted to worker processes, so it must stay at module
+    level to be picklable. The Calculator logs every operation to the root
+    logger, which would write one line per item, so those records are dropped
+    while the chunk is evaluated.
+
+    Args:
+        items: List of decoded batch items
+
+    Returns:
+        list: One result or error dictionary per item, in the same order
+    """
+    calc = Calculator()
+    root = logging.getLogger()
+    root.addFilter(_calculator_log_filter)
+    try:
+        return [evaluate_item(calc, item) for item in items]
+    finally:
+        root.removeFilter(_calculator_log_filter)
+
+
+class _ItemParser:
+    """Incremental parser for the items of a batch request body.
+
+    The body is either a single JSON array of items or newline-delimited JSON,
+    decided by its first character. In an array, items must be separated by
+    exactly one comma and the closing bracket must end the body. In NDJSON,
+    consecutive items must be separated by at least one newline.
+    """
+
+    def __init__(self):
+        """Create a parser that has not received any text yet."""
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        # "start", then "first", "item", "after" and "done" in an array, or
+        # "line" and "after" in NDJSON
+        self.state = "start"
+        self.array = False
+
+    def _error(self):
+        """Build the error raised for a body that is not valid JSON.
+
+        Returns:
+            BatchParseError: The error to raise
+        """
+        return BatchParseError("Request body is not valid JSON")
+
+    def feed(self, text, final=False):
+        """Decode every complete item in the text received so far.
+
+        An item that ends exactly at the end of the received text is only
+        decoded once more text or the end of the body arrives, so a number
+        split across chunks is never decoded as two items.
+
+        Args:
+            text: Newly received text
+            final: Whether this is the end of the body
+
+        Returns:
+            list: The newly decoded items, in order
+
+        Raises:
+            BatchParseError: If the body is not valid JSON
+        """
+        buffer = self.buffer + text
+        items = []
+        pos = 0
+        end = len(buffer)
+        while True:
+            # Waiting for more data rewinds to here, so the separator before
+            # the item is checked again once it is complete
+            mark = pos
+            newline = False
+            while pos < end and buffer[pos] in _WHITESPACE:
+                newline = newline or buffer[pos] == "\n"
+                pos += 1
+            if pos == end:
+                break
+            char = buffer[pos]
+
+            if self.state == "start":
+                if char == "[":
+                    self.array = True
+                    self.state = "first"
+                    pos += 1
+                    continue
+                self.state = "line"
+            elif self.state == "done":
+                raise self._error()
+            elif self.state == "after":
+                if self.array:
+                    if char not in ",]":
+                        raise self._error()
+                    self.state = "item" if char == "," else "done"
+                    pos += 1
+                    continue
+                if not newline:
+                    raise self._error()
+            elif self.state == "first" and char == "]":
+                self.state = "done"
+                pos += 1
+                continue
+            if char in ",]":
+                raise self._error()
+
+            try:
+                item, item_end = self.decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise self._error()
+                # The item is incomplete, wait for more data
+                pos = mark
+                break
+            except ValueError as e:
+                # Raised for integers longer than the interpreter's digit limit
+                raise BatchParseError(f"Batch item could not be decoded: {e}")
+            if item_end == end and not final:
+                # A number or literal may continue in the next chunk
+                pos = mark
+                break
+            items.append(item)
+            pos = item_end
+            self.state = "after"
+
+        self.buffer = buffer[pos:]
+        if final and (self.buffer or (self.array and self.state != "done")):
+            raise self._error()
+        return items
+
+
+async def parse_items(chunks):
+    """Incrementally parse batch items from a stream of body chunks.
+
+    The body may be a JSON array of items or newline-delimited JSON. Items are
+    yielded as soon as they have been fully received.
+
+    Args:
+        chunks: Async iterable of raw request body bytes
+
+    Yields:
+        The decoded batch items, in order
+
+    Raises:
+        BatchParseError: If the body is not valid JSON
+    """
+    parser = _ItemParser()
+    text = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(text.decode(chunk)):
+                yield item
+            if len(parser.buffer) > CALC_MAX_ITEM_BYTES:
+                raise BatchParseError("Batch item is too large or malformed")
+        items = parser.feed(text.decode(b"", final=True), final=True)
+    except UnicodeDecodeError:
+        raise BatchParseError("Request body is not valid UTF-8")
+    for item in items:
+        yield item
+
+
+async def evaluate_stream(chunks):
+    """Parse and evaluate a streamed batch of calculator operations.
+
+    Items are grouped into chunks of CALC_CHUNK_SIZE which are dispatched to
+    the worker pool while the rest of the body is still being received.
+    Batches no larger than CALC_OFFLOAD_THRESHOLD are evaluated inline.
+
+    Args:
+        chunks: Async iterable of raw request body bytes
+
+    Returns:
+        list: One result or error dictionary per item, in request order
+
+    Raises:
+        BatchParseError: If the body is not valid JSON
+        BatchTooLargeError: If the batch has more than CALC_MAX_ITEMS items
+    """
+    loop = asyncio.get_running_loop()
+    pending = []
+    chunk = []
+    count = 0
+    try:
+        async for item in parse_items(chunks):
+            count += 1
+            if count > CALC_MAX_ITEMS:
+                raise BatchTooLargeError(
+                    f"Batch exceeds the limit of {CALC_MAX_ITEMS} items"
+                )
+            chunk.append(item)
+            if len(chunk) >= CALC_CHUNK_SIZE:
+                pending.append(
+                    loop.run_in_executor(get_executor(), evaluate_chunk, chunk)
+                )
+                chunk = []
+    except BatchParseError:
+        for future in pending:
+            future.cancel()
+        raise
+
+    if not pending and len(chunk) <= CALC_OFFLOAD_THRESHOLD:
+        return evaluate_chunk(chunk)
+    if chunk:
+        pending.append(loop.run_in_executor(get_executor(), evaluate_chunk, chunk))
+
+    results = []
+    for part in await asyncio.gather(*pending):
+        results.extend(part)
+    return results
@@ -1,15 +1,26 @@
 """Main application module for the Python Web App.
 
 This module defines the FastAPI application, its routes, and event handlers.
-It provides a simple API that returns random messages from a database.
+It provides a simple API that returns random messages from a database and
+evaluates batches of calculator operations, and keeps a local copy of the
+messages table in sync in the background.
 """
 
 import logging
 import random
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 
-from .pg import connect_to_db, database, disconnect_from_db
+from .calc import (
+    BatchParseError,
+    BatchTooLargeError,
+    evaluate_stream,
+    shutdown_executor,
+)
+from .migrate import RUN_MIGRATIONS, migrate
+from .pg import DATABASE_URL, connect_to_db, database, disconnect_from_db
+from .sync import MESSAGE_SYNC_INTERVAL, MessageSync
 
 # Configure the logger
 logging.basicConfig(level=logging.INFO)
@@ -23,9 +34,17 @@ async def startup_event():
     """Connect to the database when the application starts.
 
     This function is automatically called when the FastAPI application starts.
-    It establishes a connection to the database using the connect_to_db function.
+    It applies pending schema migrations if RUN_MIGRATIONS is set, then
+    establishes a connection to the database using the connect_to_db function
+    and starts the background message sync unless MESSAGE_SYNC_INTERVAL is 0.
     """
+    if RUN_MIGRATIONS:
+        await migrate(DATABASE_URL)
     await connect_to_db()
+    app.state.message_sync = None
+    if MESSAGE_SYNC_INTERVAL > 0:
+        app.state.message_sync = MessageSync(database)
+        app.state.message_sync.start()
 
 
 @app.on_event("shutdown")
@@ -33,16 +52,23 @@ async def shutdown_event():
     """Disconnect from the database when the application shuts down.
 
     This function is automatically called when the FastAPI application shuts down.
-    It closes the database connection using the disconnect_from_db function.
+    It stops the background message sync, closes the database connection using
+    the disconnect_from_db function and stops the calculator worker pool.
     """
+    if getattr(app.state, "message_sync", None) is not None:
+        await app.state.message_sync.stop()
+        app.state.message_sync = None
     await disconnect_from_db()
+    shutdown_executor()
 
 
 @app.get("/")
 async def read_root():
     """Handle GET requests to the root endpoint.
 
-    This function retrieves a random message from the database and returns it.
+    This function returns a random message. Once the background message sync
+    has loaded the table it is served from the local copy, otherwise it is
+    retrieved from the database.
 
     Returns:
         dict: A dictionary containing a random message from the database
@@ -51,8 +77,15 @@ async def read_root():
         HTTPException: If no messages are available (404) or if there's an error
                       fetching messages from the database (500)
     """
+    message_sync = getattr(app.state, "message_sync", None)
+    if message_sync is not None and message_sync.loaded:
+        message = message_sync.random_message()
+        if message is None:
+            raise HTTPException(status_code=404, detail="No messages available")
+        return {"message": message}
+
     try:
-        query = "SELECT message FROM messages"
+        query = "SELECT message FROM messages WHERE NOT deleted"
         messages = await database.fetch_all(query=query)
         if not messages:
             # Return 404 directly without going through the exception handler
@@ -65,3 +98,44 @@ async def read_root():
     except Exception as e:
         logger.error(f"Error fetching messages: {e}")
         raise HTTPException(status_code=500, detail="Error fetching messages")
+
+
+@app.get("/messages/sync")
+async def message_sync_metrics():
+    """Handle GET requests for the background message sync metrics.
+
+    Returns:
+        dict: The sync metrics, or {"enabled": False} if the sync is disabled
+    """
+    message_sync = getattr(app.state, "message_sync", None)
+    if message_sync is None:
+        return {"enabled": False}
+    return {"enabled": True, **message_sync.metrics()}
+
+
+@app.post("/calc/batch")
+async def calc_batch(request: Request):
+    """Handle POST requests to evaluate a batch of calculator operations.
+
+    The request body is a JSON array, or newline-delimited JSON, of items of the
+    form {"op": "add", "a": 1, "b": 2} where op is one of add, subtract,
+    multiply or divide. The body is parsed as it is streamed in.
+
+    Returns:
+        JSONResponse: {"results": [...]} with one {"result": value} or
+                      {"error": message} entry per item, in request order
+
+    Raises:
+        HTTPException: If the body is malformed (400), has too many items (413)
+                      or the batch could not be evaluated (500)
+    """
+    try:
+        results = await evaluate_stream(request.stream())
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BatchParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error evaluating batch: {e}")
+        raise HTTPException(status_code=500, detail="Error evaluating batch")
+    return JSONResponse({"results": results})
@@ -0,0 +1,462 @@
+"""Database migration module for the Python Web App.
+
+This module applies the changeSets in db/changelog.yaml natively with asyncpg,
+so the schema can be migrated at startup without running Liquibase on a JVM.
+Applied changeSets are recorded in the same databasechangelog table Liquibase
+uses, so databases that were migrated by Liquibase are picked up as they are.
+Pending changeSets are applied under a PostgreSQL advisory lock, so several
+instances starting at once do not race each other.
+
+Run it from the project directory with:
+
+    python -m app.migrate [--url URL] [--status]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+
+import asyncpg
+import yaml
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHANGELOG_FILE = os.path.join(BASE_DIR, "db", "changelog.yaml")
+
+# Key of the advisory lock held while changeSets are applied
+MIGRATION_LOCK_ID = 7_300_001
+
+# Whether the application applies pending changeSets in its startup hook
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "false").lower() == "true"
+
+CHANGELOG_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS databasechangelog (
+    id VARCHAR(255) NOT NULL,
+    author VARCHAR(255) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    dateexecuted TIMESTAMP NOT NULL,
+    orderexecuted INTEGER NOT NULL,
+    exectype VARCHAR(10) NOT NULL,
+    md5sum VARCHAR(35),
+    description VARCHAR(255),
+    comments VARCHAR(255),
+    tag VARCHAR(255),
+    liquibase VARCHAR(20),
+    contexts VARCHAR(255),
+    labels VARCHAR(255),
+    deployment_id VARCHAR(10)
+)
+"""
+
+# md5sum is left empty; Liquibase fills in its own checksum on its next run
+RECORD_CHANGESET_SQL = """
+INSERT INTO databasechangelog
+    (id, author, filename, dateexecuted, orderexecuted, exectype, description,
+     comments, deployment_id)
+VALUES ($1, $2, $3, now(), $4, 'EXECUTED', $5, $6, $7)
+"""
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class MigrationError(Exception):
+    """Raised when the changelog cannot be parsed or applied."""
+
+
+class _UniqueKeyLoader(yaml.SafeLoader):
+    """YAML loader that rejects mappings with duplicate keys.
+
+    PyYAML silently keeps the last value of a repeated key, which would hide
+    copy-paste slips in the changelog.
+    """
+
+    def construct_mapping(self, node, deep=False):
+        """Build a mapping after checking that its keys are unique.
+
+        Args:
+            node: The mapping node to construct
+            deep: Whether to construct nested objects immediately
+
+        Returns:
+            dict: The constructed mapping
+
+        Raises:
+            MigrationError: If a key appears more than once
+        """
+        keys = set()
+        for key_node, _ in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            if key in keys:
+                raise MigrationError(
+                    f"Duplicate key {key!r} in changelog at line "
+                    f"{key_node.start_mark.line + 1}"
+                )
+            keys.add(key)
+        return super().construct_mapping(node, deep)
+
+
+def _identifier(name):
+    """Validate a table or column name from the changelog.
+
+    Names are used unquoted, so PostgreSQL folds them to lower case exactly
+    as it does for the tables created by Liquibase.
+
+    Args:
+        name: The identifier to validate
+
+    Returns:
+        str: The identifier
+
+    Raises:
+        MigrationError: If the name is not a plain SQL identifier
+    """
+    if not isinstance(name, str) or not _IDENTIFIER.match(name):
+        raise MigrationError(f"Invalid identifier in changelog: {name!r}")
+    return name
+
+
+def _literal(value):
+    """Render a Python value from the changelog as an SQL literal.
+
+    Args:
+        value: A string, number or boolean
+
+    Returns:
+        str: The SQL literal
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _column_definition(column):
+    """Build the SQL definition of a createTable column.
+
+    Args:
+        column: The column attributes from the changelog
+
+    Returns:
+        str: The column definition
+    """
+    parts = [_identifier(column["name"]), column["type"]]
+    if "defaultValueComputed" in column:
+        parts.append(f"DEFAULT {column['defaultValueComputed']}")
+    for key in ("defaultValue", "defaultValueNumeric", "defaultValueBoolean"):
+        if key in column:
+            parts.append(f"DEFAULT {_literal(column[key])}")
+    constraints = column.get("constraints", {})
+    if constraints.get("primaryKey"):
+        parts.append("PRIMARY KEY")
+    if constraints.get("nullable") is False:
+        parts.append("NOT NULL")
+    if constraints.get("unique"):
+        parts.append("UNIQUE")
+    return " ".join(parts)
+
+
+def create_table_sql(change):
+    """Build the SQL for a createTable change.
+
+    Args:
+        change: The createTable attributes from the changelog
+
+    Returns:
+        str: The SQL statement
+    """
+    columns = ", ".join(
+        _column_definition(item["column"]) for item in change["columns"]
+    )
+    return f"CREATE TABLE {_identifier(change['tableName'])} ({columns})"
+
+
+def insert_sql(change):
+    """Build the SQL for an insert change.
+
+    Values are rendered as literals so PostgreSQL converts them to the column
+    types, as it does for the statements Liquibase generates. Like Liquibase, a
+    column listed more than once keeps only its last value, so each insert
+    change adds exactly one row.
+
+    Args:
+        change: The insert attributes from the changelog
+
+    Returns:
+        str: The SQL statement
+    """
+    values = {}
+    for item in change["columns"]:
+        column = item["column"]
+        name = _identifier(column["name"])
+        if "valueComputed" in column:
+            values[name] = column["valueComputed"]
+        for key in ("value", "valueNumeric", "valueBoolean", "valueDate"):
+            if key in column:
+                values[name] = _literal(column[key])
+    return (
+        f"INSERT INTO {_identifier(change['tableName'])} ({', '.join(values)}) "
+        f"VALUES ({', '.join(values.values())})"
+    )
+
+
+def add_column_sql(change):
+    """Build the SQL for an addColumn change.
+
+    Args:
+        change: The addColumn attributes from the changelog
+
+    Returns:
+        str: The SQL statement
+    """
+    columns = ", ".join(
+        f"ADD COLUMN {_column_definition(item['column'])}" for item in change["columns"]
+    )
+    return f"ALTER TABLE {_identifier(change['tableName'])} {columns}"
+
+
+def create_index_sql(change):
+    """Build the SQL for a createIndex change.
+
+    Args:
+        change: The createIndex attributes from the changelog
+
+    Returns:
+        str: The SQL statement
+    """
+    unique = "UNIQUE " if change.get("unique") else ""
+    columns = ", ".join(
+        _identifier(item["column"]["name"]) for item in change["columns"]
+    )
+    return (
+        f"CREATE {unique}INDEX {_identifier(change['indexName'])} "
+        f"ON {_identifier(change['tableName'])} ({columns})"
+    )
+
+
+def raw_sql(change):
+    """Return the SQL of an sql change.
+
+    The text is sent to PostgreSQL as a single query, which may contain
+    several statements, so it behaves like Liquibase with splitStatements
+    set to false.
+
+    Args:
+        change: The sql attributes from the changelog
+
+    Returns:
+        str: The SQL text
+    """
+    return change["sql"]
+
+
+# SQL builders for each supported change type
+CHANGE_TYPES = {
+    "createTable": create_table_sql,
+    "insert": insert_sql,
+    "addColumn": add_column_sql,
+    "createIndex": create_index_sql,
+    "sql": raw_sql,
+}
+
+
+def load_changesets(path=CHANGELOG_FILE):
+    """Load and validate the changeSets from a YAML changelog.
+
+    Args:
+        path: Path to the changelog file
+
+    Returns:
+        list: The changeSets, in changelog order
+
+    Raises:
+        MigrationError: If the changelog repeats a key or a changeSet, or a
+                        changeSet uses an unsupported change type
+    """
+    with open(path, "r") as f:
+        changelog = yaml.load(f, Loader=_UniqueKeyLoader)
+    changesets = []
+    seen = set()
+    for entry in changelog.get("databaseChangeLog", []):
+        changeset = entry.get("changeSet")
+        if changeset is None:
+            continue
+        for change in changeset.get("changes", []):
+            for change_type in change:
+                if change_type not in CHANGE_TYPES:
+                    raise MigrationError(
+                        f"Unsupported change type {change_type} in changeSet "
+                        f"{changeset['id']}"
+                    )
+        key = (str(changeset["id"]), str(changeset["author"]))
+        if key in seen:
+            raise MigrationError(f"Duplicate changeSet {key[0]} by {key[1]}")
+        seen.add(key)
+        changesets.append(
+            {
+                "id": str(changeset["id"]),
+                "author": str(changeset["author"]),
+                "comment": changeset.get("comment"),
+                "changes": changeset.get("changes", []),
+            }
+        )
+    return changesets
+
+
+def _dsn(url):
+    """Convert a SQLAlchemy style database URL to an asyncpg DSN.
+
+    Args:
+        url: Database URL, optionally with a driver such as postgresql+asyncpg
+
+    Returns:
+        str: The URL with a plain postgresql scheme
+    """
+    scheme, separator, rest = url.partition("://")
+    return "postgresql://" + rest if separator else url
+
+
+async def _applied(conn):
+    """Read the changeSets that have already been applied.
+
+    Args:
+        conn: An open asyncpg connection
+
+    Returns:
+        tuple: The set of applied (id, author) pairs and the last order number
+    """
+    rows = await conn.fetch("SELECT id, author, orderexecuted FROM databasechangelog")
+    applied = {(row["id"], row["author"]) for row in rows}
+    last_order = max((row["orderexecuted"] for row in rows), default=0)
+    return applied, last_order
+
+
+async def _apply_changeset(conn, changeset, filename, order, deployment_id):
+    """Apply a single changeSet and record it in one transaction.
+
+    Args:
+        conn: An open asyncpg connection
+        changeset: The changeSet to apply
+        filename: Changelog path to record for the changeSet
+        order: Order number to record for the changeSet
+        deployment_id: Identifier shared by all changeSets of this run
+    """
+    change_types = []
+    async with conn.transaction():
+        for change in changeset["changes"]:
+            for change_type, attributes in change.items():
+                await conn.execute(CHANGE_TYPES[change_type](attributes))
+                change_types.append(change_type)
+        await conn.execute(
+            RECORD_CHANGESET_SQL,
+            changeset["id"],
+            changeset["author"],
+            filename,
+            order,
+            ", ".join(change_types),
+            changeset["comment"],
+            deployment_id,
+        )
+
+
+async def pending_changesets(url, path=CHANGELOG_FILE):
+    """List the changeSets that have not been applied yet.
+
+    Args:
+        url: URL of the database to inspect
+        path: Path to the changelog file
+
+    Returns:
+        list: Ids of the pending changeSets
+    """
+    changesets = load_changesets(path)
+    conn = await asyncpg.connect(_dsn(url))
+    try:
+        exists = await conn.fetchval("SELECT to_regclass('databasechangelog')")
+        applied = (await _applied(conn))[0] if exists else set()
+    finally:
+        await conn.close()
+    return [c["id"] for c in changesets if (c["id"], c["author"]) not in applied]
+
+
+async def migrate(url, path=CHANGELOG_FILE):
+    """Apply every pending changeSet to a database.
+
+    Args:
+        url: URL of the database to migrate
+        path: Path to the changelog file
+
+    Returns:
+        list: Ids of the changeSets that were applied
+
+    Raises:
+        MigrationError: If the changelog is invalid
+    """
+    changesets = load_changesets(path)
+    conn = await asyncpg.connect(_dsn(url))
+    try:
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        try:
+            await conn.execute(CHANGELOG_TABLE_SQL)
+            applied, order = await _applied(conn)
+            filename = os.path.relpath(path, BASE_DIR)
+            deployment_id = str(int(time.time()))[-10:]
+            applied_now = []
+            for changeset in changesets:
+                if (changeset["id"], changeset["author"]) in applied:
+                    continue
+                order += 1
+                await _apply_changeset(conn, changeset, filename, order, deployment_id)
+                logger.info(f"Applied changeSet {changeset['id']}.")
+                applied_now.append(changeset["id"])
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    finally:
+        await conn.close()
+    logger.info(f"Database migrated, {len(applied_now)} changeSet(s) applied.")
+    return applied_now
+
+
+def main(argv=None):
+    """Apply pending changeSets, or list them with --status.
+
+    Args:
+        argv: Command line arguments, defaults to sys.argv
+
+    Returns:
+        int: 0 on success, 1 if the database could not be migrated
+    """
+    parser = argparse.ArgumentParser(description="Apply db/changelog.yaml.")
+    parser.add_argument(
+        "--url", default=os.getenv("DB_URL"), help="Database URL (default: $DB_URL)"
+    )
+    parser.add_argument("--changelog", default=CHANGELOG_FILE)
+    parser.add_argument(
+        "--status", action="store_true", help="List pending changeSets only"
+    )
+    args = parser.parse_args(argv)
+    if not args.url:
+        logger.error("No database URL given and DB_URL is not set.")
+        return 1
+
+    try:
+        if args.status:
+            pending = asyncio.run(pending_changesets(args.url, args.changelog))
+            print(f"{len(pending)} changeSet(s) pending: {', '.join(pending)}")
+        else:
+            asyncio.run(migrate(args.url, args.changelog))
+    except Exception as e:
+        logger.error(f"Error migrating the database: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Message table sync module for the Python Web App.
+
+This module keeps a local copy of the messages table up to date in the
+background. After an initial full load, each sync only fetches the rows whose
+updated_at is at or after the database time the previous sync started at, so a
+table without changes returns no rows. Deleted
+messages are soft-deleted by setting their deleted tombstone column, so their
+removal reaches the local copy as an ordinary change. Rows removed with a hard
+DELETE are not seen until the application restarts.
+
+Once the first sync has completed, the root endpoint serves random messages
+from the local copy instead of querying the table on every request.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import random
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between syncs; 0 disables the background task
+MESSAGE_SYNC_INTERVAL = float(os.getenv("MESSAGE_SYNC_INTERVAL", "30"))
+# Seconds before the previous sync's start that are fetched again on every sync
+MESSAGE_SYNC_OVERLAP = float(os.getenv("MESSAGE_SYNC_OVERLAP", "5"))
+# Seconds shutdown waits for a sync in progress before cancelling it
+MESSAGE_SYNC_STOP_TIMEOUT = float(os.getenv("MESSAGE_SYNC_STOP_TIMEOUT", "10"))
+
+NOW_QUERY = "SELECT now()"
+FULL_QUERY = "SELECT id, message, deleted, updated_at FROM messages"
+DELTA_QUERY = (
+    "SELECT id, message, deleted, updated_at FROM messages "
+    "WHERE updated_at >= :since"
+)
+
+
+class MessageSync:
+    """Keep a local copy of the messages table in sync incrementally.
+
+    The high-water mark is the database's now() read just before the
+    previous sync's query, not the newest updated_at seen, so rows that share
+    an old timestamp are not fetched again. updated_at is set by the database
+    when a transaction starts, so a row committed by a transaction that
+    started before the previous sync can carry a timestamp just below the
+    high-water mark. Each delta query therefore reaches MESSAGE_SYNC_OVERLAP
+    seconds back; rows seen twice are applied idempotently by id.
+    """
+
+    def __init__(
+        self,
+        database,
+        interval=MESSAGE_SYNC_INTERVAL,
+        overlap=MESSAGE_SYNC_OVERLAP,
+    ):
+        """Create a sync for a database.
+
+        Args:
+            database: The Database to read the messages table from
+            interval: Seconds between syncs
+            overlap: Seconds before the previous sync's start to fetch again
+        """
+        self.database = database
+        self.interval = interval
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self.messages = {}
+        # Ids of the messages in a list, so a random one is picked in O(1)
+        self._ids = []
+        self._positions = {}
+        self.high_water_mark = None
+        self.syncs = 0
+        self.errors = 0
+        self.rows_per_sync = 0
+        self.rows_total = 0
+        self.last_sync_duration = None
+        self._last_sync = None
+        self._task = None
+        self._stopping = None
+
+    @property
+    def loaded(self):
+        """bool: Whether the initial full load has completed."""
+        return self.syncs > 0
+
+    def random_message(self):
+        """Pick a random message from the local copy.
+
+        Returns:
+            str: A random message, or None if the copy is empty
+        """
+        if not self._ids:
+            return None
+        return self.messages[random.choice(self._ids)]
+
+    def _put(self, id, message):
+        """Add or update a message in the local copy.
+
+        Args:
+            id: The message id
+            message: The message text
+        """
+        if id not in self.messages:
+            self._positions[id] = len(self._ids)
+            self._ids.append(id)
+        self.messages[id] = message
+
+    def _remove(self, id):
+        """Remove a message from the local copy if it is present.
+
+        The last id takes the place of the removed one, so removal is O(1).
+
+        Args:
+            id: The message id
+        """
+        if self.messages.pop(id, None) is None:
+            return
+        position = self._positions.pop(id)
+        last = self._ids.pop()
+        if last != id:
+            self._ids[position] = last
+            self._positions[last] = position
+
+    async def sync_once(self):
+        """Fetch the rows changed since the last sync and apply them.
+
+        Returns:
+            int: Number of rows fetched
+        """
+        started = time.monotonic()
+        # Read before the query, so no change it misses is newer than this
+        synced_at = await self.database.fetch_val(query=NOW_QUERY)
+        if self.high_water_mark is None:
+            rows = await self.database.fetch_all(query=FULL_QUERY)
+        else:
+            since = self.high_water_mark - self.overlap
+            rows = await self.database.fetch_all(
+                query=DELTA_QUERY, values={"since": since}
+            )
+
+        for row in rows:
+            if row["deleted"]:
+                self._remove(row["id"])
+            else:
+                self._put(row["id"], row["message"])
+        self.high_water_mark = synced_at
+
+        self.syncs += 1
+        self.rows_per_sync = len(rows)
+        self.rows_total += len(rows)
+        self.last_sync_duration = time.monotonic() - started
+        self._last_sync = started
+        logger.debug(f"Synced {len(rows)} message rows.")
+        return len(rows)
+
+    async def run(self):
+        """Sync the messages table every interval seconds until stopped."""
+        while not self._stopping.is_set():
+            try:
+                await self.sync_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error syncing messages: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start syncing in a background task."""
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+        logger.info(f"Message sync started with a {self.interval}s interval.")
+
+    async def stop(self, timeout=MESSAGE_SYNC_STOP_TIMEOUT):
+        """Stop the background task and wait for it to finish.
+
+        A sync in progress is given up to timeout seconds to complete and
+        return its connection to the pool before the database is disconnected.
+        A longer one, such as the initial load of a large table, is cancelled
+        so it cannot stall shutdown.
+
+        Args:
+            timeout: Seconds to wait for a sync in progress
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Message sync still running after {timeout}s, cancelling.")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("Message sync stopped.")
+
+    def metrics(self):
+        """Report the state of the sync.
+
+        Returns:
+            dict: Sync lag in seconds since the last successful sync started,
+                  rows fetched by the last sync and in total, and counters
+        """
+        lag = None
+        if self._last_sync is not None:
+            lag = time.monotonic() - self._last_sync
+        return {
+            "sync_lag_seconds": lag,
+            "rows_per_sync": self.rows_per_sync,
+            "rows_total": self.rows_total,
+            "syncs": self.syncs,
+            "errors": self.errors,
+            "last_sync_duration_seconds": self.last_sync_duration,
+            "messages": len(self.messages),
+            "high_water_mark": (
+                self.high_water_mark.isoformat() if self.high_water_mark else None
+            ),
+        }
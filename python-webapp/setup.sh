@@ -5,7 +5,7 @@ python --version | brew install python
 poetry --version | brew install poetry
 poetry init --no-interaction
 poetry install --no-root
-poetry add fastapi uvicorn databases asyncio sqlalchemy psycopg2-binary asyncpg httpx pytest testcontainers pytest-html urllib3 pytest-asyncio
+poetry add fastapi uvicorn databases asyncio sqlalchemy psycopg2-binary asyncpg httpx pytest testcontainers pytest-html urllib3 pytest-asyncio pyyaml
 function fetch_driver() {
   source .env
   echo "Fetching PostgreSQL JDBC driver... for version $DRIVER_VERSION"
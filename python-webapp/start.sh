@@ -1,16 +1,6 @@
 #!/bin/sh
 set -e
 source .env
-# Define the path to the JDBC driver
-JDBC_DRIVER_PATH="./lib/"
-DRIVER_PATH="./lib/postgresql-$DRIVER_VERSION.jar"
-# Check if the JDBC driver is missing and download it if necessary
-#if [ ! -f "$JDBC_DRIVER_PATH" ]; then
-#  echo "PostgreSQL JDBC driver not found. Downloading..."
-#  mkdir -p ./lib
-#  curl -o "$JDBC_DRIVER_PATH" https://repo1.maven.org/maven2/org/postgresql/postgresql/42.2.23/postgresql-42.7.3.jar
-#fi
-
 # Kill any application running on port 5432
 if lsof -i:5432 -t >/dev/null; then
   echo "Killing application running on port 5432..."
@@ -19,9 +9,9 @@ fi
 
 # Load environment variables from .env file
 export $(grep -v '^#' .env | xargs)
-DATABASE_URL="jdbc:postgresql://$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB"
 DATABASE_USER="$POSTGRES_USER"
 DATABASE_PASSWORD="$POSTGRES_PASSWORD"
+DATABASE_URL="postgresql://$DATABASE_USER:$DATABASE_PASSWORD@$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB"
 
 # Stop and remove any existing containers
 docker-compose down --remove-orphans || true
@@ -43,18 +33,11 @@ while ! docker exec postgres_db pg_isready -U "$DATABASE_USER"; do
 done
 echo "PostgreSQL is ready."
 
-echo "Checking database connection..."
-# Check if the database connection is working
-if ! liquibase --classpath=$DRIVER_PATH --url=$DATABASE_URL --username=$DATABASE_USER --password=$DATABASE_PASSWORD --changeLogFile=./db/changelog.yaml --driver=org.postgresql.Driver --log-level debug status; then
-  echo "Database connection failed. Exiting script."
-  exit 1
-fi
-echo "Database connection is working."
-
-echo "Applying database migrations... to $DATABASE_URL"
-# Run Liquibase to update the database schema
-if ! liquibase --classpath=$DRIVER_PATH --url=$DATABASE_URL --username=$DATABASE_USER --password=$DATABASE_PASSWORD --changeLogFile=./db/changelog.yaml --driver=org.postgresql.Driver --log-level debug update; then
-  echo "Liquibase update failed. Exiting script."
+echo "Applying database migrations... to $POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB"
+# Apply pending changeSets from db/changelog.yaml; this fails if the database
+# connection is not working
+if ! poetry run python -m app.migrate --url "$DATABASE_URL"; then
+  echo "Database migration failed. Exiting script."
   exit 1
 fi
 
@@ -0,0 +1,216 @@
+"""Unit tests for the batch calculation module.
+
+This module contains unit tests for incremental parsing and evaluation of
+calculator batches, including the worker pool path used for large batches.
+"""
+
+import logging
+
+import pytest
+from app import calc
+from app.calc import (
+    BatchParseError,
+    BatchTooLargeError,
+    evaluate_chunk,
+    evaluate_stream,
+    parse_items,
+)
+
+
+async def stream(*chunks):
+    """Yield the given byte chunks as an async request body stream.
+
+    Args:
+        *chunks: Raw body chunks
+
+    Yields:
+        bytes: Each chunk in turn
+    """
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(chunks):
+    """Parse a stream of body chunks into a list of items.
+
+    Args:
+        chunks: Async iterable of raw body chunks
+
+    Returns:
+        list: The decoded items
+    """
+    return [item async for item in parse_items(chunks)]
+
+
+@pytest.fixture(scope="function")
+def worker_pool():
+    """Shut down the calculator worker pool after a test has used it."""
+    yield
+    calc.shutdown_executor()
+
+
+def test_evaluate_chunk():
+    """Test that items are evaluated in order with per-item errors."""
+    items = [
+        {"op": "subtract", "a": 5, "b": 3},
+        {"op": "divide", "a": 1, "b": 0},
+        {"op": "add", "a": "1", "b": 2},
+        {"op": "add", "a": True, "b": 2},
+        [1, 2],
+        {"op": "multiply", "a": 1e308, "b": 10},
+    ]
+    assert evaluate_chunk(items) == [
+        {"result": 2},
+        {"error": "Cannot divide by zero"},
+        {"error": "Operands a and b must be numbers"},
+        {"error": "Operands a and b must be numbers"},
+        {"error": "Item must be an object"},
+        {"error": "Result is not a finite number"},
+    ]
+
+
+def test_evaluate_chunk_overflow():
+    """Test that an overflowing operation fails only its own item."""
+    items = [
+        {"op": "divide", "a": 10**400, "b": 2},
+        {"op": "add", "a": 1, "b": 2},
+    ]
+    results = evaluate_chunk(items)
+    assert "error" in results[0]
+    assert results[1] == {"result": 3}
+
+
+def test_evaluate_chunk_does_not_log_operations(caplog):
+    """Test that the Calculator's per-operation log lines are dropped."""
+    items = [{"op": "add", "a": 1, "b": 2}] * 10
+    with caplog.at_level(logging.INFO):
+        evaluate_chunk(items)
+        logging.info("Still logged")
+    assert [r.getMessage() for r in caplog.records] == ["Still logged"]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_split_across_chunks():
+    """Test that items split across chunk boundaries are parsed once complete."""
+    chunks = stream(b'[{"op": "add", ', b'"a": 1, "b": 2}, {"op": "div', b'ide"}]')
+    assert await collect(chunks) == [
+        {"op": "add", "a": 1, "b": 2},
+        {"op": "divide"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_ndjson():
+    """Test that newline-delimited JSON bodies are accepted."""
+    chunks = stream(b'{"op": "add"}\n{"op": "sub', b'tract"}\n')
+    assert await collect(chunks) == [{"op": "add"}, {"op": "subtract"}]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_split_utf8():
+    """Test that multi-byte characters split across chunks are decoded."""
+    body = '[{"op": "é"}]'.encode("utf-8")
+    chunks = stream(body[:10], body[10:])
+    assert await collect(chunks) == [{"op": "é"}]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_malformed():
+    """Test that a truncated body raises a parse error."""
+    with pytest.raises(BatchParseError):
+        await collect(stream(b'[{"op": "add"}, {"op"'))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'[[{"op": "add"}]]]]]',
+        b'{"op": "add"}{"op": "add"}',
+        b'{"op": "add"} {"op": "add"}',
+        b'[{"op": "add"},, {"op": "add"}]',
+        b'[{"op": "add"},]',
+        b'[{"op": "add"} {"op": "add"}]',
+        b'[{"op": "add"}] {"op": "add"}',
+        b'[{"op": "add"}',
+        b",",
+    ],
+)
+async def test_parse_items_invalid_framing(body):
+    """Test that bodies which are not one array or NDJSON are rejected.
+
+    Args:
+        body: The request body
+    """
+    with pytest.raises(BatchParseError):
+        await collect(stream(body[:7], body[7:]))
+
+
+@pytest.mark.asyncio
+async def test_parse_items_split_scalar():
+    """Test that a number split across chunks is decoded as one item."""
+    assert await collect(stream(b"[1", b"23]")) == [123]
+    assert await collect(stream(b"1", b"23\n4", b"5")) == [123, 45]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_ndjson_split_at_separator():
+    """Test that an NDJSON item split right after its newline is accepted."""
+    chunks = stream(b'{"op": "add"}\n{"op"', b': "subtract"}')
+    assert await collect(chunks) == [{"op": "add"}, {"op": "subtract"}]
+
+
+@pytest.mark.asyncio
+async def test_parse_items_empty():
+    """Test that an empty array and an empty body contain no items."""
+    assert await collect(stream(b"[ ]")) == []
+    assert await collect(stream(b"")) == []
+
+
+@pytest.mark.asyncio
+async def test_parse_items_integer_too_long():
+    """Test that integers over the interpreter's digit limit are a parse error."""
+    body = b'{"op": "add", "a": ' + b"1" * 5000 + b', "b": 2}'
+    with pytest.raises(BatchParseError):
+        await collect(stream(body))
+
+
+@pytest.mark.asyncio
+async def test_parse_items_item_too_large(monkeypatch):
+    """Test that an unterminated item larger than the buffer limit is rejected.
+
+    Args:
+        monkeypatch: Pytest fixture for patching objects
+    """
+    monkeypatch.setattr(calc, "CALC_MAX_ITEM_BYTES", 16)
+    with pytest.raises(BatchParseError):
+        await collect(stream(b'[{"op": "', b"a" * 32))
+
+
+@pytest.mark.asyncio
+async def test_evaluate_stream_too_many_items(monkeypatch):
+    """Test that batches over the item limit are rejected.
+
+    Args:
+        monkeypatch: Pytest fixture for patching objects
+    """
+    monkeypatch.setattr(calc, "CALC_MAX_ITEMS", 1)
+    with pytest.raises(BatchTooLargeError):
+        await evaluate_stream(stream(b'[{"op": "add"}, {"op": "add"}]'))
+
+
+@pytest.mark.asyncio
+async def test_evaluate_stream_worker_pool(monkeypatch, worker_pool):
+    """Test that large batches are evaluated in the worker pool in order.
+
+    Args:
+        monkeypatch: Pytest fixture for patching objects
+        worker_pool: Fixture that shuts down the worker pool afterwards
+    """
+    monkeypatch.setattr(calc, "CALC_OFFLOAD_THRESHOLD", 2)
+    monkeypatch.setattr(calc, "CALC_CHUNK_SIZE", 3)
+    body = b"".join(b'{"op": "multiply", "a": %d, "b": 2}\n' % i for i in range(10))
+
+    results = await evaluate_stream(stream(body[:50], body[50:]))
+    assert results == [{"result": i * 2} for i in range(10)]
+    assert calc._executor is not None
@@ -0,0 +1,185 @@
+"""Tests for the database migration module.
+
+This module contains unit tests for turning changelog changeSets into SQL, and
+integration tests that apply the changelog to an empty PostgreSQL database.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from app.migrate import (
+    MigrationError,
+    add_column_sql,
+    create_index_sql,
+    create_table_sql,
+    insert_sql,
+    load_changesets,
+    migrate,
+    pending_changesets,
+)
+from sqlalchemy import create_engine, text
+
+from .conftest import database_url
+
+
+@pytest.fixture(scope="function")
+def empty_db_url(pg_server, pg_admin):
+    """Provide an empty database without the schema applied.
+
+    Args:
+        pg_server: Fixture that provides the server URL
+        pg_admin: Fixture that provides the maintenance engine
+
+    Yields:
+        str: URL of the empty database
+    """
+    name = f"test_empty_{uuid.uuid4().hex[:12]}"
+    with pg_admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    try:
+        yield database_url(pg_server, name, "postgresql")
+    finally:
+        with pg_admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+
+
+def test_load_changesets():
+    """Test that the project changelog is loaded in order."""
+    changesets = load_changesets()
+    assert [c["id"] for c in changesets] == ["1", "2", "3"]
+    assert list(changesets[0]["changes"][0]) == ["createTable"]
+
+
+def test_load_changesets_unsupported(tmp_path):
+    """Test that unsupported change types are rejected before anything runs."""
+    changelog = tmp_path / "changelog.yaml"
+    changelog.write_text(
+        "databaseChangeLog:\n"
+        "  - changeSet:\n"
+        "      id: 1\n"
+        "      author: author\n"
+        "      changes:\n"
+        "        - dropTable:\n"
+        "            tableName: messages\n"
+    )
+    with pytest.raises(MigrationError):
+        load_changesets(str(changelog))
+
+
+@pytest.mark.parametrize(
+    "changeset",
+    [
+        "      id: 1\n      id: 2\n      author: author\n",
+        "      id: 1\n      author: author\n"
+        "  - changeSet:\n      id: 1\n      author: author\n",
+    ],
+)
+def test_load_changesets_duplicates(tmp_path, changeset):
+    """Test that repeated keys and changeSets are rejected."""
+    changelog = tmp_path / "changelog.yaml"
+    changelog.write_text("databaseChangeLog:\n  - changeSet:\n" + changeset)
+    with pytest.raises(MigrationError):
+        load_changesets(str(changelog))
+
+
+def test_create_table_sql():
+    """Test that createTable changes are converted to CREATE TABLE statements."""
+    change = {
+        "tableName": "messages",
+        "columns": [
+            {
+                "column": {
+                    "name": "id",
+                    "type": "serial",
+                    "constraints": {"primaryKey": True, "nullable": False},
+                }
+            },
+            {"column": {"name": "deleted", "type": "boolean", "defaultValue": False}},
+        ],
+    }
+    assert create_table_sql(change) == (
+        "CREATE TABLE messages "
+        "(id serial PRIMARY KEY NOT NULL, deleted boolean DEFAULT FALSE)"
+    )
+
+
+def test_insert_sql():
+    """Test that insert changes keep the last value of a repeated column."""
+    change = {
+        "tableName": "messages",
+        "columns": [
+            {"column": {"name": "message", "value": "first"}},
+            {"column": {"name": "message", "value": "it's last"}},
+        ],
+    }
+    assert insert_sql(change) == (
+        "INSERT INTO messages (message) VALUES ('it''s last')"
+    )
+
+
+def test_add_column_sql():
+    """Test that addColumn changes are converted to ALTER TABLE statements."""
+    change = {
+        "tableName": "messages",
+        "columns": [
+            {
+                "column": {
+                    "name": "updated_at",
+                    "type": "timestamptz",
+                    "defaultValueComputed": "now()",
+                    "constraints": {"nullable": False},
+                }
+            },
+        ],
+    }
+    assert add_column_sql(change) == (
+        "ALTER TABLE messages ADD COLUMN updated_at timestamptz DEFAULT now() NOT NULL"
+    )
+
+
+def test_create_index_sql():
+    """Test that createIndex changes are converted to CREATE INDEX statements."""
+    change = {
+        "tableName": "messages",
+        "indexName": "idx_messages_updated_at",
+        "columns": [{"column": {"name": "updated_at"}}],
+    }
+    assert create_index_sql(change) == (
+        "CREATE INDEX idx_messages_updated_at ON messages (updated_at)"
+    )
+
+
+def test_invalid_identifier():
+    """Test that table names which are not plain identifiers are rejected."""
+    with pytest.raises(MigrationError):
+        create_table_sql({"tableName": "messages; DROP", "columns": []})
+
+
+@pytest.mark.integration
+def test_migrate(empty_db_url):
+    """Test that pending changeSets are applied once and recorded."""
+    assert asyncio.run(pending_changesets(empty_db_url)) == ["1", "2", "3"]
+    assert asyncio.run(migrate(empty_db_url)) == ["1", "2", "3"]
+    assert asyncio.run(migrate(empty_db_url)) == []
+    assert asyncio.run(pending_changesets(empty_db_url)) == []
+
+    engine = create_engine(empty_db_url.replace("postgresql", "postgresql+psycopg2"))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM messages")).scalar() == 1
+        ids = conn.execute(
+            text("SELECT id FROM databasechangelog ORDER BY orderexecuted")
+        ).scalars()
+        assert list(ids) == ["1", "2", "3"]
+    engine.dispose()
+
+
+@pytest.mark.integration
+def test_migrate_concurrent(empty_db_url):
+    """Test that concurrent runs apply each changeSet exactly once."""
+
+    async def run_all():
+        return await asyncio.gather(*(migrate(empty_db_url) for _ in range(4)))
+
+    results = asyncio.run(run_all())
+    assert sorted(results) == [[], [], [], ["1", "2", "3"]]
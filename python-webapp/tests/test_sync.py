@@ -0,0 +1,200 @@
+"""Tests for the background message sync.
+
+This module contains unit tests that apply full and delta syncs from a mocked
+database, and an integration test that syncs a real messages table.
+"""
+
+import asyncio
+import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from app.sync import DELTA_QUERY, FULL_QUERY, NOW_QUERY, MessageSync
+from databases import Database
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+T0 = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def row(id, message, seconds, deleted=False):
+    """Build a messages row as returned by the database.
+
+    Args:
+        id: The message id
+        message: The message text
+        seconds: Seconds after T0 the row was last updated
+        deleted: Whether the row is a tombstone
+
+    Returns:
+        dict: The row
+    """
+    return {
+        "id": id,
+        "message": message,
+        "deleted": deleted,
+        "updated_at": T0 + datetime.timedelta(seconds=seconds),
+    }
+
+
+@pytest.mark.asyncio
+async def test_sync_full_then_delta():
+    """Test that the first sync loads everything and later ones apply deltas."""
+    database = AsyncMock()
+    sync = MessageSync(database, interval=1, overlap=5)
+
+    database.fetch_val.return_value = T0 + datetime.timedelta(seconds=25)
+    database.fetch_all.return_value = [
+        row(1, "one", 0),
+        row(2, "two", 10),
+        row(3, "gone", 20, deleted=True),
+    ]
+    assert await sync.sync_once() == 3
+    database.fetch_val.assert_awaited_with(query=NOW_QUERY)
+    database.fetch_all.assert_awaited_with(query=FULL_QUERY)
+    assert sync.messages == {1: "one", 2: "two"}
+    assert sync.high_water_mark == T0 + datetime.timedelta(seconds=25)
+
+    database.fetch_val.return_value = T0 + datetime.timedelta(seconds=45)
+    database.fetch_all.return_value = [
+        row(1, "one", 30, deleted=True),
+        row(2, "two again", 40),
+        row(4, "four", 40),
+    ]
+    assert await sync.sync_once() == 3
+    database.fetch_all.assert_awaited_with(
+        query=DELTA_QUERY, values={"since": T0 + datetime.timedelta(seconds=20)}
+    )
+    assert sync.messages == {2: "two again", 4: "four"}
+    assert sorted(sync._ids) == [2, 4]
+    assert {sync.random_message() for _ in range(50)} == {"two again", "four"}
+
+    metrics = sync.metrics()
+    assert metrics["rows_per_sync"] == 3
+    assert metrics["rows_total"] == 6
+    assert metrics["syncs"] == 2
+    assert metrics["messages"] == 2
+    assert metrics["sync_lag_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_sync_window_follows_database_clock():
+    """Test that the delta window moves with the database clock, not the rows.
+
+    Rows that all share an old updated_at, as the migration that added the
+    column leaves them, must not be fetched again by every later sync.
+    """
+    database = AsyncMock()
+    sync = MessageSync(database, overlap=5)
+
+    database.fetch_val.return_value = T0 + datetime.timedelta(hours=1)
+    database.fetch_all.return_value = [row(i, f"m{i}", 0) for i in range(100)]
+    assert await sync.sync_once() == 100
+
+    database.fetch_val.return_value = T0 + datetime.timedelta(hours=2)
+    database.fetch_all.return_value = []
+    assert await sync.sync_once() == 0
+    database.fetch_all.assert_awaited_with(
+        query=DELTA_QUERY,
+        values={"since": T0 + datetime.timedelta(hours=1, seconds=-5)},
+    )
+    assert sync.high_water_mark == T0 + datetime.timedelta(hours=2)
+    assert sync.metrics()["rows_per_sync"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_task_survives_errors():
+    """Test that the background task counts errors and keeps syncing."""
+    database = AsyncMock()
+    database.fetch_val.return_value = T0
+    database.fetch_all.side_effect = [Exception("Database error")] + [
+        [row(1, "one", 0)]
+    ] * 100
+    sync = MessageSync(database, interval=0.01)
+
+    sync.start()
+    for _ in range(100):
+        if sync.syncs:
+            break
+        await asyncio.sleep(0.01)
+    await sync.stop()
+
+    assert sync.errors == 1
+    assert sync.messages == {1: "one"}
+    assert sync.metrics()["sync_lag_seconds"] is not None
+
+
+@pytest.mark.asyncio
+async def test_sync_random_message_empty():
+    """Test that an empty copy has no random message once loaded."""
+    database = AsyncMock()
+    database.fetch_all.return_value = [row(1, "gone", 0, deleted=True)]
+    sync = MessageSync(database)
+    assert not sync.loaded
+
+    await sync.sync_once()
+    assert sync.loaded
+    assert sync.random_message() is None
+
+
+@pytest.mark.asyncio
+async def test_sync_stop_timeout():
+    """Test that stopping cancels a sync that runs past the timeout."""
+
+    async def slow_fetch(**kwargs):
+        await asyncio.sleep(60)
+
+    database = AsyncMock()
+    database.fetch_all.side_effect = slow_fetch
+    sync = MessageSync(database, interval=1)
+
+    sync.start()
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(sync.stop(timeout=0.05), 5)
+    assert sync.syncs == 0
+
+
+@pytest.mark.integration
+def test_sync_delta(db_url):
+    """Test that only rows changed since the last sync are fetched."""
+    engine = create_engine(db_url)
+    url = make_url(db_url).set(drivername="postgresql")
+    database = Database(url.render_as_string(hide_password=False))
+    sync = MessageSync(database, overlap=0)
+
+    async def run_sync():
+        await database.connect()
+        try:
+            return await sync.sync_once()
+        finally:
+            await database.disconnect()
+
+    # Seed rows before the first sync
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO messages (message) VALUES ('a'), ('b')"))
+        total = conn.execute(text("SELECT count(*) FROM messages")).scalar()
+        ids = dict(conn.execute(text("SELECT message, id FROM messages")).all())
+
+    assert asyncio.run(run_sync()) == total
+    assert len(sync.messages) == total
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO messages (message) VALUES ('new')"))
+        conn.execute(
+            text("UPDATE messages SET message = 'edited' WHERE id = :id"),
+            {"id": ids["a"]},
+        )
+        conn.execute(
+            text("UPDATE messages SET deleted = true WHERE id = :id"), {"id": ids["b"]}
+        )
+    engine.dispose()
+
+    assert asyncio.run(run_sync()) == 3
+    assert sync.messages[ids["a"]] == "edited"
+    assert ids["b"] not in sync.messages
+    assert "new" in sync.messages.values()
+    assert len(sync.messages) == total
+
+    # Nothing changed since the last sync, so nothing is fetched
+    assert asyncio.run(run_sync()) == 0
+    assert len(sync.messages) == total
@@ -0,0 +1,191 @@
+"""Tests for the fix_flake8.py script.
+
+This module contains tests for the content fixes, file discovery, the
+content-hash cache and the command line exit code. Run them from the
+repository root with:
+
+    python -m pytest tests
+"""
+
+import os
+
+import fix_flake8
+from fix_flake8 import find_python_files, fix_content, fix_paths, main
+
+LONG = "x" * 90
+
+
+def test_adds_docstring_to_function():
+    """Test that a test function without a docstring gets one."""
+    content = "def test_add_numbers():\n    assert True\n"
+    assert fix_content(content) == (
+        'def test_add_numbers():\n    """Test add numbers."""\n    assert True\n'
+    )
+
+
+def test_adds_docstring_to_method_at_body_indent():
+    """Test that methods get a docstring at the indentation of their body."""
+    content = (
+        "class TestCalculator:\n"
+        "    def test_add(self):\n"
+        "        assert True\n"
+        "\n"
+        "    async def test_subtract(self) -> None:\n"
+        "        assert True\n"
+    )
+    fixed = fix_content(content)
+    assert fixed == (
+        "class TestCalculator:\n"
+        "    def test_add(self):\n"
+        '        """Test add."""\n'
+        "        assert True\n"
+        "\n"
+        "    async def test_subtract(self) -> None:\n"
+        '        """Test subtract."""\n'
+        "        assert True\n"
+    )
+    compile(fixed, "<test>", "exec")
+
+
+def test_keeps_existing_method_docstring():
+    """Test that methods which already have a docstring are left alone."""
+    content = (
+        "class TestCalculator:\n"
+        "    def test_add(self):\n"
+        '        """Test that numbers are added."""\n'
+        "        assert True\n"
+        "\n"
+        "    def test_raw(self):\n"
+        "        r'''Test a raw docstring.'''\n"
+    )
+    assert fix_content(content) == content
+
+
+def test_merges_docstring_and_comment_edits():
+    """Test that several edits in one file are applied at the right offsets."""
+    content = (
+        f"# {LONG}\n"
+        "def test_one():\n"
+        "    pass\n"
+        f"value = 1  # {LONG}\n"
+        "def test_two():\n"
+        "    pass\n"
+    )
+    assert fix_content(content) == (
+        "# Shortened comment\n"
+        "def test_one():\n"
+        '    """Test one."""\n'
+        "    pass\n"
+        "value = 1  # Shortened comment\n"
+        "def test_two():\n"
+        '    """Test two."""\n'
+        "    pass\n"
+    )
+
+
+def test_keeps_pragmas_and_strings():
+    """Test that pragmas and "# " inside strings are never shortened."""
+    content = (
+        f"from app import a, b  # noqa: E402 {LONG}\n"
+        f'URL = "https://example.com/{LONG}# section"\n'
+        f"items = []  # type: list {LONG}\n"
+    )
+    assert fix_content(content) == content
+
+
+def test_skips_test_defs_inside_strings():
+    """Test that a def inside a triple-quoted string is left alone."""
+    content = (
+        's = """\ndef test_inside_string():\n    return 1\n"""\n'
+        "def test_real():\n"
+        "    assert s\n"
+    )
+    fixed = fix_content(content)
+    assert fixed == content.replace(
+        "    assert s\n", '    """Test real."""\n    assert s\n'
+    )
+    compile(fixed, "<test>", "exec")
+
+
+def test_leaves_uncompilable_files_alone(tmp_path):
+    """Test that a file the fixes cannot handle is never rewritten."""
+    content = "def test_broken(:\n    pass\n"
+    assert fix_content(content) == content
+
+    source = tmp_path / "test_strings.py"
+    source.write_text('s = """\ndef test_inside_string():\n    return 1\n"""\n')
+    assert main([str(source), "--no-cache"]) == 0
+    compile(source.read_text(), str(source), "exec")
+
+
+def test_app_imports_only_in_legacy_mode():
+    """Test that the web app import rewrites only run when requested."""
+    content = "import os\nfrom app.main import app\n"
+    assert fix_content(content) == content
+    assert fix_content(content, app_imports=True) == (
+        "import os\nfrom app.main import app  # noqa: E402\n"
+    )
+
+
+def test_find_python_files(tmp_path):
+    """Test that Python files are found outside the excluded directories."""
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "module.py").write_text("")
+    (tmp_path / "pkg" / "notes.txt").write_text("")
+    for excluded in (".git", "__pycache__", ".venv"):
+        (tmp_path / excluded).mkdir()
+        (tmp_path / excluded / "skipped.py").write_text("")
+    single = tmp_path / "single.py"
+    single.write_text("")
+
+    assert find_python_files([str(tmp_path), str(single)]) == [
+        str(tmp_path / "pkg" / "module.py"),
+        str(single),
+    ]
+
+
+def test_fix_paths_cache(tmp_path, monkeypatch):
+    """Test that unchanged files are skipped and edited files are fixed again."""
+    source = tmp_path / "test_sample.py"
+    source.write_text("def test_one():\n    pass\n")
+    cache = str(tmp_path / "cache.json")
+
+    assert fix_paths([str(tmp_path)], jobs=1, cache_path=cache) == [str(source)]
+    assert '"""Test one."""' in source.read_text()
+
+    calls = []
+    real_fix_file = fix_flake8.fix_file
+    monkeypatch.setattr(
+        fix_flake8, "fix_file", lambda *args: calls.append(args) or real_fix_file(*args)
+    )
+    assert fix_paths([str(tmp_path)], jobs=1, cache_path=cache) == []
+    assert calls == []
+
+    source.write_text(source.read_text() + "\ndef test_two():\n    pass\n")
+    assert fix_paths([str(tmp_path)], jobs=1, cache_path=cache) == [str(source)]
+    assert '"""Test two."""' in source.read_text()
+
+
+def test_fix_paths_parallel(tmp_path):
+    """Test that files fixed in worker processes are rewritten."""
+    files = []
+    for i in range(fix_flake8.MIN_PARALLEL_FILES):
+        path = tmp_path / f"test_{i}.py"
+        path.write_text("def test_one():\n    pass\n")
+        files.append(str(path))
+
+    assert fix_paths([str(tmp_path)], jobs=2, cache_path=None) == files
+    for path in files:
+        assert '"""Test one."""' in open(path).read()
+
+
+def test_main_exit_code(tmp_path, capsys):
+    """Test that main exits with 1 only when a file was rewritten."""
+    source = tmp_path / "test_sample.py"
+    source.write_text("def test_one():\n    pass\n")
+    cache = os.path.join(tmp_path, "cache.json")
+
+    assert main([str(tmp_path), "--cache", cache]) == 1
+    assert f"Fixed {source}" in capsys.readouterr().out
+    assert main([str(tmp_path), "--cache", cache]) == 0
+    assert main([str(tmp_path), "--no-cache"]) == 0